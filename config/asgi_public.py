@@ -0,0 +1,13 @@
+"""
+Public-only ASGI config for config project.
+
+Serves the polls URLs only, see ``config.settings_public``.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_public')
+
+application = get_asgi_application()
@@ -127,3 +127,33 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Polls
+
+# Vote through signed vote tokens instead of the session and CSRF cookie.
+POLLS_STATELESS_VOTING = True
+
+# Seconds a vote token embedded in the voting form stays valid.
+POLLS_VOTE_TOKEN_MAX_AGE = 60 * 60
+
+# Append votes to the vote log and let `manage.py process_votes`
+# apply them, instead of updating `Choice.votes` in the request.
+POLLS_VOTE_QUEUE = False
+
+# Number of `process_votes` workers, each one consumes a partition
+# of the vote log. Drain the log before changing it.
+POLLS_VOTE_QUEUE_PARTITIONS = 1
+
+# Pending votes above which new votes are refused with a 503.
+POLLS_VOTE_QUEUE_MAX_LAG = 100000
+
+# Seconds browsers may cache the public polls pages of anonymous users.
+POLLS_CACHE_MAX_AGE = 60
+
+# Seconds the edge may cache them, votes and admin edits purge them
+# by surrogate key. Keep it below POLLS_VOTE_TOKEN_MAX_AGE.
+POLLS_EDGE_CACHE_MAX_AGE = 10 * 60
+
+# Callable receiving the surrogate keys to purge from the edge.
+POLLS_PURGE_BACKEND = 'polls.http_cache.null_purge'
@@ -0,0 +1,7 @@
+"""config public URL Configuration, without the admin site.
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path('', include('polls.urls')),
+]
@@ -0,0 +1,13 @@
+"""
+Public-only WSGI config for config project.
+
+Serves the polls URLs only, see ``config.settings_public``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings_public')
+
+application = get_wsgi_application()
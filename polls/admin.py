@@ -1,18 +1,83 @@
 # standard libraries
 import datetime
 # standard libraries
+from django import forms
 from django.contrib import admin
+from django.core.paginator import Paginator
 from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 from django.utils import timezone
 # local libraries
-from .models import Question, Choice
+from .http_cache import purge_question
+from .models import ArchivedChoice, Collection, Question, Choice
 
 
-class ChoiceInline(admin.TabularInline):
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Only build the forms of one page of the related objects."""
+    per_page = 50
+    page_var = 'page'
+    page_number = 1
+    params = QueryDict()
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            self.page = Paginator(queryset, self.per_page).get_page(
+                self.page_number
+            )
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def page_query(self, number) -> str:
+        """Return the query string of the page `number`, keeping the
+        other parameters, like the changelist filters and the popup.
+        """
+        params = self.params.copy()
+        params[self.page_var] = number
+        return params.urlencode()
+
+    def previous_page_query(self) -> str:
+        return self.page_query(self.page.previous_page_number())
+
+    def next_page_query(self) -> str:
+        return self.page_query(self.page.next_page_number())
+
+
+class PaginatedInlineMixin:
+    formset = PaginatedInlineFormSet
+    template = 'admin/polls/edit_inline/paginated_tabular.html'
+    per_page = 50
+    page_var = 'choice_page'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_var = self.page_var
+        formset.page_number = request.GET.get(self.page_var, 1)
+        formset.params = request.GET
+        return formset
+
+
+class ChoiceInline(PaginatedInlineMixin, admin.TabularInline):
     model = Choice
+    # The vote counters are only changed by votes, so they stay
+    # consistent with the vote log, see `reconcile_votes`.
+    readonly_fields = ['votes']
     extra = 3
 
 
+class ArchivedChoiceInline(PaginatedInlineMixin, admin.TabularInline):
+    model = ArchivedChoice
+    fields = ['choice_text', 'votes']
+    readonly_fields = ['choice_text', 'votes']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class RecentFilter(admin.SimpleListFilter):
     title = 'recently published'
     parameter_name = 'published'
@@ -76,16 +141,70 @@ class ChoiceFilter(admin.SimpleListFilter):
         )
 
 
+class QuestionAdminForm(forms.ModelForm):
+    bulk_choices = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 5}),
+        required=False,
+        help_text='One choice per line.'
+    )
+    bulk_choices_file = forms.FileField(
+        required=False,
+        help_text='UTF-8 text file with one choice per line.'
+    )
+
+    class Meta:
+        model = Question
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lines = cleaned_data.get('bulk_choices', '').splitlines()
+        upload = cleaned_data.get('bulk_choices_file')
+        if upload:
+            try:
+                lines += [
+                    line.decode('utf-8') for line in upload
+                ]
+            except UnicodeDecodeError:
+                raise forms.ValidationError(
+                    'The choices file is not a UTF-8 text file.'
+                )
+        max_length = Choice._meta.get_field('choice_text').max_length
+        new_choices = []
+        for line in lines:
+            choice_text = line.strip()
+            if not choice_text:
+                continue
+            if len(choice_text) > max_length:
+                raise forms.ValidationError(
+                    f'Choices must have at most {max_length} characters.'
+                )
+            new_choices.append(choice_text)
+        if new_choices and self.instance.archived:
+            raise forms.ValidationError(
+                'Choices can not be added to an archived question.'
+            )
+        cleaned_data['new_choices'] = new_choices
+        return cleaned_data
+
+
 class QuestionAdmin(admin.ModelAdmin):
+    form = QuestionAdminForm
     fieldsets = [
         (
             None, {
-                'fields': ['question_text']
+                'fields': ['question_text', 'poll_type', 'collection']
             }
         ),
         (
             'Date Information', {
-                'fields': ['published_date']
+                'fields': ['published_date', 'closed_date']
+            }
+        ),
+        (
+            'Bulk Choices', {
+                'fields': ['bulk_choices', 'bulk_choices_file'],
+                'classes': ['collapse']
             }
         )
     ]
@@ -93,10 +212,55 @@ class QuestionAdmin(admin.ModelAdmin):
     list_display = (
         'question_text', 'id',
         'published_date', 'was_published_recently',
-        'choice_numbers'
+        'choice_numbers', 'archived'
     )
-    list_filter = ['published_date', RecentFilter, ChoiceFilter]
+    list_filter = [
+        'published_date', RecentFilter, ChoiceFilter,
+        'poll_type', 'collection', 'archived'
+    ]
     search_fields = ['question_text']
 
+    def get_queryset(self, request):
+        # Annotate the choices counts of `choice_numbers`.
+        return super().get_queryset(request).annotate(
+            n_choice=Count('choice', distinct=True),
+            n_archived_choice=Count('archivedchoice', distinct=True)
+        )
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is not None and obj.has_votes:
+            # The counters would mix single choice votes and ballots.
+            return [*readonly_fields, 'poll_type']
+        return readonly_fields
+
+    def get_inlines(self, request, obj):
+        if obj is not None and obj.archived:
+            return [ArchivedChoiceInline]
+        return self.inlines
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        new_choices = form.cleaned_data['new_choices']
+        if not new_choices:
+            return
+        Choice.objects.bulk_create(
+            [
+                Choice(question=form.instance, choice_text=choice_text)
+                for choice_text in new_choices
+            ],
+            batch_size=500
+        )
+        # bulk_create() does not send the post_save signal.
+        purge_question(form.instance.pk, index=True)
+        self.message_user(request, f'Added {len(new_choices)} choices.')
+
+
+class CollectionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    search_fields = ['name']
+
 
+admin.site.register(Collection, CollectionAdmin)
 admin.site.register(Question, QuestionAdmin)
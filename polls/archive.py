@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.utils import timezone
+from .http_cache import purge_question
+from .ingestion import pending_votes
+from .models import ArchivedChoice, Choice, Question
+
+
+def closed_questions(collection=None, now=None):
+    """Return the closed questions that are still in the live tables.
+    Questions with queued votes not applied by the workers yet are left
+    for a later run, their votes would be lost with their choices.
+    """
+    now = now or timezone.now()
+    questions = Question.objects.filter(
+        archived=False,
+        closed_date__lte=now
+    ).exclude(
+        pk__in=pending_votes().values('question_id')
+    )
+    if collection is not None:
+        questions = questions.filter(collection=collection)
+    return questions
+
+
+@transaction.atomic
+def archive_question(question: Question) -> int:
+    """Move the choices of `question` into the archive table and
+    return the number of archived choices. The queued votes of the
+    question must have been applied, see `closed_questions()`.
+    """
+    choices = Choice.objects.filter(question=question)
+    archived = ArchivedChoice.objects.bulk_create([
+        ArchivedChoice(
+            question_id=question.id,
+            choice_id=choice_id,
+            choice_text=choice_text,
+            votes=votes
+        )
+        for choice_id, choice_text, votes in choices.values_list(
+            'pk', 'choice_text', 'votes'
+        )
+    ])
+    choices.delete()
+    Question.objects.filter(pk=question.pk).update(archived=True)
+    question.archived = True
+    purge_question(question.pk, index=True)
+    return len(archived)
+
+
+def archive_closed_questions(collection=None, now=None):
+    """Archive every closed question and return
+    `(questions, choices)` counts.
+    """
+    questions = choices = 0
+    for question in closed_questions(collection, now).iterator():
+        choices += archive_question(question)
+        questions += 1
+    return questions, choices
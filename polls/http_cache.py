@@ -0,0 +1,141 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.module_loading import import_string
+
+INDEX_KEY = 'polls-index'
+
+
+def question_key(question_id) -> str:
+    return f'question-{question_id}'
+
+
+def is_anonymous(request) -> bool:
+    """Return True if the request has no session, without loading it."""
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def add_cache_headers(request, response, keys):
+    """Make a successful GET response of an anonymous user cacheable
+    by the browser and the edge, tagged with the surrogate `keys`.
+    Responses that set a cookie, or that use the CSRF token and will get
+    the CSRF cookie, are private.
+    """
+    if request.method not in ('GET', 'HEAD') \
+            or response.status_code != 200:
+        return response
+    if not is_anonymous(request) or response.cookies \
+            or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.POLLS_CACHE_MAX_AGE
+    )
+    patch_vary_headers(response, ['Cookie'])
+    response['Surrogate-Control'] = \
+        f'max-age={settings.POLLS_EDGE_CACHE_MAX_AGE}'
+    response['Surrogate-Key'] = ' '.join(keys)
+    return response
+
+
+class SurrogateCacheMixin:
+    """Add the cache headers and the surrogate keys of `surrogate_keys()`
+    to the responses of the view.
+    """
+
+    def surrogate_keys(self) -> list:
+        return []
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        keys = self.surrogate_keys()
+        if getattr(response, 'is_rendered', True):
+            return add_cache_headers(request, response, keys)
+        # The template may still use the CSRF token when rendered.
+        response.add_post_render_callback(
+            lambda response: add_cache_headers(request, response, keys)
+        )
+        return response
+
+
+def purge(keys):
+    """Purge the surrogate `keys` from the edge once the current
+    transaction is committed. The keys of a transaction are collected
+    and sent to the purge backend in a single call.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'pending_purge', None)
+    # The hook is discarded along with its keys when the transaction
+    # is rolled back.
+    if pending is not None and any(
+        hook[1] is pending[1] for hook in connection.run_on_commit
+    ):
+        pending[0].update(keys)
+        return
+    keys_to_purge = set(keys)
+
+    def send():
+        connection.pending_purge = None
+        backend = import_string(settings.POLLS_PURGE_BACKEND)
+        backend(sorted(keys_to_purge))
+
+    connection.pending_purge = (keys_to_purge, send)
+    transaction.on_commit(send)
+
+
+def purge_question(question_id, index=False):
+    """Purge the pages of a question, and the index pages if `index`."""
+    keys = [question_key(question_id)]
+    if index:
+        keys.append(INDEX_KEY)
+    purge(keys)
+
+
+def null_purge(keys):
+    """Purge backend for deployments without an edge cache."""
+
+
+class LocalProxyCache:
+    """In-process stand-in for a reverse proxy honouring the
+    `Surrogate-Control` and `Surrogate-Key` headers, for the tests.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, client, path):
+        """Return the cached response of `path`, or fetch it with the
+        test `client` and cache it if it is public.
+        """
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[2]
+        response = client.get(path)
+        control = response.get('Surrogate-Control', '')
+        if 'public' in response.get('Cache-Control', '') \
+                and control.startswith('max-age='):
+            expires = time.monotonic() + int(control[len('max-age='):])
+            keys = set(response.get('Surrogate-Key', '').split())
+            self.entries[path] = (expires, keys, response)
+        return response
+
+    def purge(self, keys):
+        keys = set(keys)
+        self.entries = {
+            path: entry for path, entry in self.entries.items()
+            if not entry[1] & keys
+        }
+
+    def clear(self):
+        self.entries = {}
+
+
+local_proxy = LocalProxyCache()
+
+
+def local_proxy_purge(keys):
+    """Purge backend of the `local_proxy` stand-in."""
+    local_proxy.purge(keys)
@@ -0,0 +1,227 @@
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+from .http_cache import purge, purge_question, question_key
+from .models import Choice, Question, Vote, VoteOffset
+
+OFFSET_PREFIX = 'votes'
+
+
+class VoteQueueFull(Exception):
+    """The vote log has more pending votes than the workers can keep up."""
+
+
+def offset_name(partition: int, partitions: int) -> str:
+    return f'{OFFSET_PREFIX}-{partition}-of-{partitions}'
+
+
+def worker_offsets() -> dict:
+    """Return the positions of the workers, by partition count then by
+    partition, including the offsets left by earlier partition counts.
+    """
+    layouts = {}
+    offsets = VoteOffset.objects.filter(
+        name__startswith=f'{OFFSET_PREFIX}-'
+    ).values_list('name', 'position')
+    for name, position in offsets:
+        partition, _, partitions = \
+            name[len(OFFSET_PREFIX) + 1:].partition('-of-')
+        layouts.setdefault(int(partitions), {})[int(partition)] = position
+    return layouts
+
+
+def start_position(partitions: int, layouts: dict) -> int:
+    """Return the position a new worker starts from when the partition
+    count changes: every vote up to it was consumed by all the
+    partitions of an earlier partition count.
+    """
+    start = 0
+    for count, positions in layouts.items():
+        if count != partitions and len(positions) == count:
+            start = max(start, min(positions.values()))
+    return start
+
+
+def is_consumed(vote_id: int, question_id: int, layouts: dict) -> bool:
+    """Return True if a worker of any partition count in `layouts`
+    has consumed the vote.
+    """
+    return any(
+        vote_id <= positions.get(question_id % count, 0)
+        for count, positions in layouts.items()
+    )
+
+
+def partition_votes(partition: int, partitions: int):
+    """Return the queued votes consumed by the given `partition`."""
+    votes = Vote.objects.filter(queued=True)
+    if partitions > 1:
+        votes = votes.annotate(
+            partition=Mod('question_id', partitions)
+        ).filter(partition=partition)
+    return votes
+
+
+def pending_votes(layouts=None):
+    """Return the queued votes not consumed by any worker yet,
+    whatever the partition count they were consumed with.
+    """
+    if layouts is None:
+        layouts = worker_offsets()
+    votes = Vote.objects.filter(queued=True)
+    for count, positions in layouts.items():
+        field = f'partition_of_{count}'
+        votes = votes.annotate(**{field: Mod('question_id', count)})
+        for partition, position in positions.items():
+            votes = votes.exclude(**{field: partition, 'pk__lte': position})
+    return votes
+
+
+def pending_votes_estimate() -> int:
+    """Return an upper bound of the pending votes: the votes after the
+    position of the slowest worker, the partitions without a worker
+    yet counting from where they will start.
+    """
+    partitions = settings.POLLS_VOTE_QUEUE_PARTITIONS
+    layouts = worker_offsets()
+    positions = layouts.get(partitions, {})
+    start = start_position(partitions, layouts)
+    slowest = min(
+        positions.get(partition, start) for partition in range(partitions)
+    )
+    return Vote.objects.filter(queued=True, pk__gt=slowest).count()
+
+
+def apply_vote(question_id: int, choice_id: int) -> bool:
+    """Count a vote right away and record it in the vote log.
+    Return False if the choice is unknown, the poll is closed or the
+    poll is not a single choice poll anymore.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Using F() to avoiding race conditions
+        updated = Choice.objects.filter(
+            Q(question__closed_date__isnull=True) |
+            Q(question__closed_date__gt=now),
+            pk=choice_id,
+            question_id=question_id,
+            question__poll_type=Question.SINGLE
+        ).update(votes=F('votes') + 1)
+        if not updated:
+            return False
+        Vote.objects.create(
+            question_id=question_id,
+            choice_id=choice_id,
+            created_date=now,
+            queued=False
+        )
+    purge_question(question_id)
+    return True
+
+
+def enqueue_vote(question_id: int, choice_id: int) -> Vote:
+    """Append a vote to the vote log.
+    Raise `VoteQueueFull` if the workers are too far behind.
+    """
+    if pending_votes_estimate() >= settings.POLLS_VOTE_QUEUE_MAX_LAG:
+        raise VoteQueueFull
+    return Vote.objects.create(question_id=question_id, choice_id=choice_id)
+
+
+def process_batch(partition=0, partitions=1, batch_size=1000) -> int:
+    """Apply the next `batch_size` votes of a partition of the vote log,
+    and return the number of consumed votes.
+
+    Votes are coalesced by choice, and the counters and the offset of
+    the partition are updated in the same transaction, so every vote
+    is applied exactly once.
+    """
+    name = offset_name(partition, partitions)
+    if not VoteOffset.objects.filter(name=name).exists():
+        VoteOffset.objects.get_or_create(name=name, defaults={
+            'position': start_position(partitions, worker_offsets())
+        })
+    with transaction.atomic():
+        # Lock the offset with a write before any read: SQLite cannot
+        # upgrade the read lock of a transaction while the web processes
+        # append votes, it fails at once instead of waiting.
+        VoteOffset.objects.filter(name=name).update(position=F('position'))
+        offset = VoteOffset.objects.select_for_update().get(name=name)
+        layouts = worker_offsets()
+        # Votes consumed before the partition count changed are skipped.
+        earlier = {
+            count: positions for count, positions in layouts.items()
+            if count != partitions
+        }
+        votes = list(
+            partition_votes(partition, partitions).filter(
+                pk__gt=offset.position
+            ).order_by('pk').values_list(
+                'pk', 'question_id', 'choice_id', 'created_date'
+            )[:batch_size]
+        )
+        if not votes:
+            # Catch up with the log, so an idle partition does not hold
+            # back the estimate of the pending votes.
+            last_id = Vote.objects.filter(queued=True).aggregate(
+                last_id=Max('pk')
+            )['last_id'] or 0
+            if last_id > offset.position:
+                offset.position = last_id
+                offset.save(update_fields=['position'])
+            return 0
+        # Votes queued before a poll changed to multi-select or
+        # ranked choice have no ballot, they are dropped.
+        closed_dates = dict(
+            Question.objects.filter(
+                pk__in={question_id for _, question_id, _, _ in votes},
+                poll_type=Question.SINGLE
+            ).values_list('pk', 'closed_date')
+        )
+        tallies = Counter(
+            (question_id, choice_id)
+            for vote_id, question_id, choice_id, created_date in votes
+            if not is_consumed(vote_id, question_id, earlier)
+            and question_id in closed_dates
+            and (
+                closed_dates[question_id] is None
+                or created_date < closed_dates[question_id]
+            )
+        )
+        for (question_id, choice_id), count in tallies.items():
+            # Votes for unknown or archived choices are dropped.
+            Choice.objects.filter(
+                pk=choice_id,
+                question_id=question_id
+            ).update(votes=F('votes') + count)
+        offset.position = votes[-1][0]
+        offset.save(update_fields=['position'])
+        purge({question_key(question_id) for question_id, _ in tallies})
+    return len(votes)
+
+
+def queue_status() -> list:
+    """Return `(name, position, pending, oldest_pending_date)`
+    for every partition of the vote log.
+    """
+    partitions = settings.POLLS_VOTE_QUEUE_PARTITIONS
+    layouts = worker_offsets()
+    positions = layouts.get(partitions, {})
+    start = start_position(partitions, layouts)
+    votes = pending_votes(layouts).annotate(
+        partition=Mod('question_id', partitions)
+    )
+    status = []
+    for partition in range(partitions):
+        pending = votes.filter(partition=partition).order_by('pk')
+        oldest = pending.values_list('created_date', flat=True).first()
+        status.append((
+            offset_name(partition, partitions),
+            positions.get(partition, start),
+            pending.count(),
+            oldest
+        ))
+    return status
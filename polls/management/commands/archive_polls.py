@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from polls.archive import archive_closed_questions, closed_questions
+from polls.models import Collection
+
+
+class Command(BaseCommand):
+    help = "Move the choices of closed polls into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection',
+            help="Only archive the polls of the collection with this slug."
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report the polls that would be archived."
+        )
+
+    def handle(self, *args, **options):
+        collection = None
+        if options['collection']:
+            try:
+                collection = Collection.objects.get(
+                    slug=options['collection']
+                )
+            except Collection.DoesNotExist:
+                raise CommandError(
+                    f"Collection {options['collection']!r} does not exist."
+                )
+        if options['dry_run']:
+            count = closed_questions(collection).count()
+            self.stdout.write(f"{count} poll(s) would be archived.")
+            return
+        questions, choices = archive_closed_questions(collection)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {questions} poll(s) with {choices} choice(s)."
+        ))
@@ -0,0 +1,69 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from polls.tally import group_ballots, instant_runoff, pack_ballot
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the instant-runoff tally engine on random ranked "
+        "ballots, without the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ballots',
+            type=int,
+            default=1_000_000,
+            help="Number of ballots."
+        )
+        parser.add_argument(
+            '--choices',
+            type=int,
+            default=8,
+            help="Number of choices of the poll."
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed of the random ballots."
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        choices = options['choices']
+        # Skew the first preferences so the runoff needs several rounds.
+        weights = [choices - index for index in range(choices)]
+        candidates = range(choices)
+
+        started = time.perf_counter()
+        packed = []
+        for _ in range(options['ballots']):
+            first = rng.choices(candidates, weights)[0]
+            rest = [index for index in candidates if index != first]
+            rng.shuffle(rest)
+            ranking = [first] + rest[:rng.randint(0, choices - 1)]
+            packed.append(pack_ballot(ranking))
+        generated = time.perf_counter()
+        ballots = group_ballots(packed)
+        grouped = time.perf_counter()
+        winner, rounds = instant_runoff(ballots, choices)
+        finished = time.perf_counter()
+
+        size = sum(len(ballot) for ballot in packed)
+        self.stdout.write(
+            f"{len(packed)} ballots, {choices} choices, "
+            f"{size / 1024 / 1024:.1f} MiB packed, "
+            f"{len(ballots)} distinct ballots"
+        )
+        self.stdout.write(
+            f"  generate and pack: {generated - started:8.3f}s"
+        )
+        self.stdout.write(
+            f"  unpack and group:  {grouped - generated:8.3f}s"
+        )
+        self.stdout.write(
+            f"  instant runoff:    {finished - grouped:8.3f}s "
+            f"({len(rounds)} rounds, winner {winner})"
+        )
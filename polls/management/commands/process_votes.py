@@ -0,0 +1,106 @@
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from polls.ingestion import process_batch
+
+# Seconds to wait before retrying a batch, doubled on every failure.
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 5.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the votes of the vote log to the choices. Starts one worker "
+        "process per partition (POLLS_VOTE_QUEUE_PARTITIONS) unless "
+        "--partition is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partition',
+            type=int,
+            help="Only consume this partition of the vote log."
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of votes applied per transaction."
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the vote log is drained."
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Exit when the vote log is drained."
+        )
+
+    def handle(self, *args, **options):
+        partitions = settings.POLLS_VOTE_QUEUE_PARTITIONS
+        partition = options['partition']
+        if partition is None and partitions > 1:
+            return self._spawn_workers(partitions, options)
+        partition = partition or 0
+        if not 0 <= partition < partitions:
+            raise CommandError(
+                f"Partition must be between 0 and {partitions - 1}."
+            )
+        applied = 0
+        retry_delay = RETRY_DELAY
+        started = time.perf_counter()
+        while True:
+            try:
+                count = process_batch(
+                    partition, partitions, options['batch_size']
+                )
+            except OperationalError as error:
+                # The database is busy, e.g. locked by the web processes
+                # appending votes during a spike. The batch was rolled
+                # back, so it is simply retried.
+                self.stderr.write(
+                    f"Partition {partition}: {error}, retrying in "
+                    f"{retry_delay:.1f}s."
+                )
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                continue
+            retry_delay = RETRY_DELAY
+            applied += count
+            if count:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Partition {partition}: applied {applied} vote(s) "
+            f"in {elapsed:.2f}s."
+        ))
+
+    def _spawn_workers(self, partitions, options):
+        command = [
+            sys.executable, settings.BASE_DIR / 'manage.py', 'process_votes',
+            '--batch-size', str(options['batch_size']),
+            '--interval', str(options['interval']),
+        ]
+        if options['once']:
+            command.append('--once')
+        workers = [
+            subprocess.Popen(command + ['--partition', str(partition)])
+            for partition in range(partitions)
+        ]
+        try:
+            failed = [worker for worker in workers if worker.wait() != 0]
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            raise
+        if failed:
+            raise CommandError(f"{len(failed)} worker(s) failed.")
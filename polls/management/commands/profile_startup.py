@@ -0,0 +1,162 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: times `AppConfig.ready()` of every app,
+# the import of the entry point and the first request it serves.
+PROFILE_SCRIPT = '''
+import importlib, io, json, sys, time
+started = time.perf_counter()
+from django.apps import config as apps_config
+
+ready_timings = {}
+create = apps_config.AppConfig.create.__func__
+
+
+def timed_create(cls, entry):
+    app_config = create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        began = time.perf_counter()
+        ready()
+        ready_timings[app_config.name] = time.perf_counter() - began
+    app_config.ready = timed_ready
+    return app_config
+
+
+apps_config.AppConfig.create = classmethod(timed_create)
+application = importlib.import_module(sys.argv[1]).application
+loaded = time.perf_counter()
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET',
+    'PATH_INFO': sys.argv[2],
+    'QUERY_STRING': '',
+    'SCRIPT_NAME': '',
+    'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80',
+    'HTTP_HOST': 'localhost',
+    'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr,
+    'wsgi.url_scheme': 'http',
+}
+response = application(environ, lambda code, headers: status.append(code))
+b''.join(response)
+finished = time.perf_counter()
+print(json.dumps({
+    'load': loaded - started,
+    'first_request': finished - loaded,
+    'status': status[0] if status else None,
+    'ready': ready_timings,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile the cold start of a WSGI entry point in a fresh process: "
+        "import time per module, AppConfig.ready() time per app and the "
+        "time to the first request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entry',
+            default='config.wsgi',
+            help="Module exposing the WSGI `application` "
+                 "(e.g. config.wsgi_public)."
+        )
+        parser.add_argument(
+            '--path',
+            default='/',
+            help="Path of the first request."
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=15,
+            help="Number of slowest packages and modules to show."
+        )
+
+    def handle(self, *args, **options):
+        env = os.environ.copy()
+        # Let the entry point choose its own settings module.
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        process = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT,
+                options['entry'], options['path']
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise CommandError(process.stderr.strip().splitlines()[-1])
+        report = json.loads(process.stdout.strip().splitlines()[-1])
+        modules = self._parse_importtime(process.stderr)
+        limit = options['limit']
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Startup of {options['entry']}"
+        ))
+        self.stdout.write(
+            f"  load (imports + setup): {report['load'] * 1000:9.1f} ms"
+        )
+        self.stdout.write(
+            f"  first request {options['path']} ({report['status']}): "
+            f"{report['first_request'] * 1000:9.1f} ms"
+        )
+        self.stdout.write(
+            f"  modules imported: {len(modules)}"
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            "AppConfig.ready() per app"
+        ))
+        for name, seconds in sorted(
+            report['ready'].items(), key=lambda item: -item[1]
+        ):
+            self.stdout.write(f"  {seconds * 1000:9.2f} ms  {name}")
+
+        packages = defaultdict(int)
+        for module, (self_us, _) in modules.items():
+            packages['.'.join(module.split('.')[:3])] += self_us
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            "Import time per package (self)"
+        ))
+        for package, self_us in sorted(
+            packages.items(), key=lambda item: -item[1]
+        )[:limit]:
+            self.stdout.write(f"  {self_us / 1000:9.2f} ms  {package}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            "Slowest modules (cumulative)"
+        ))
+        for module, (_, cumulative_us) in sorted(
+            modules.items(), key=lambda item: -item[1][1]
+        )[:limit]:
+            self.stdout.write(f"  {cumulative_us / 1000:9.2f} ms  {module}")
+
+    @staticmethod
+    def _parse_importtime(output: str) -> dict:
+        """Return `{module: (self_us, cumulative_us)}` from the
+        `-X importtime` output.
+        """
+        modules = {}
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            try:
+                self_us, cumulative_us, module = line[12:].split('|')
+                modules[module.strip()] = (int(self_us), int(cumulative_us))
+            except ValueError:
+                # The header line of the output.
+                continue
+        return modules
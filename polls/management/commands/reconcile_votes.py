@@ -0,0 +1,83 @@
+import time
+from django.core.management.base import BaseCommand
+from polls.reconcile import (
+    has_baselines, questions_to_reconcile, reconcile_questions,
+    record_baselines, save_baseline_mark, save_marks
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the vote counters of the choices to the vote log and "
+        "the ballots, and repair them. Only the questions with new votes "
+        "since the last run are checked, unless --full is given. The "
+        "first run records the votes counted before the vote log was "
+        "kept as the baselines of the choices."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Check every live question."
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report the drift, without repairing it."
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help="Number of questions checked per transaction."
+        )
+
+    def handle(self, *args, **options):
+        repair = not options['dry_run']
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        if not has_baselines():
+            self._record_baselines(repair, chunk_size)
+            return
+        questions, marks = questions_to_reconcile(options['full'])
+        questions = list(questions)
+        drifted = drift = 0
+        for start in range(0, len(questions), chunk_size):
+            chunk = questions[start:start + chunk_size]
+            for choice_id, votes, expected in reconcile_questions(
+                chunk, repair
+            ):
+                drifted += 1
+                drift += expected - votes
+                self.stdout.write(
+                    f"Choice {choice_id}: {votes} vote(s), "
+                    f"{expected} expected"
+                )
+        if repair:
+            save_marks(*marks)
+        elapsed = time.perf_counter() - started
+        rate = len(questions) / elapsed if elapsed else 0
+        action = "Repaired" if repair else "Found"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(questions)} question(s) in {elapsed:.2f}s "
+            f"({rate:.0f} question(s)/s). {action} {drifted} drifted "
+            f"choice(s), net drift {drift:+d} vote(s)."
+        ))
+
+    def _record_baselines(self, save, chunk_size):
+        questions, marks = questions_to_reconcile(full=True)
+        questions = list(questions)
+        baselined = 0
+        for start in range(0, len(questions), chunk_size):
+            baselined += record_baselines(
+                questions[start:start + chunk_size], save
+            )
+        if save:
+            save_marks(*marks)
+            save_baseline_mark(marks[0])
+        action = "Recorded" if save else "Would record"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} the baselines of {len(questions)} question(s), "
+            f"{baselined} choice(s) have votes before the vote log."
+        ))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from polls.ingestion import queue_status
+
+
+class Command(BaseCommand):
+    help = "Show the lag of the process_votes workers on the vote log."
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        for name, position, pending, oldest in queue_status():
+            total += pending
+            age = f"{(now - oldest).total_seconds():.1f}s" if oldest else "-"
+            self.stdout.write(
+                f"{name}: offset {position}, {pending} pending, "
+                f"oldest pending {age}"
+            )
+        limit = settings.POLLS_VOTE_QUEUE_MAX_LAG
+        style = self.style.WARNING if total >= limit else self.style.SUCCESS
+        self.stdout.write(style(f"Total pending: {total} / {limit}"))
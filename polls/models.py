@@ -2,52 +2,182 @@
 import datetime
 # third party libraries
 from django.db import models
-from django.contrib import admin
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 
+class Collection(models.Model):
+    name = models.CharField(max_length=128)
+    slug = models.SlugField(unique=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Question(models.Model):
+    SINGLE = 'single'
+    APPROVAL = 'approval'
+    RANKED = 'ranked'
+    POLL_TYPES = [
+        (SINGLE, _('Single choice')),
+        (APPROVAL, _('Multi-select')),
+        (RANKED, _('Ranked choice')),
+    ]
+
+    collection = models.ForeignKey(
+        Collection,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
     question_text = models.CharField(max_length=256)
+    poll_type = models.CharField(
+        max_length=16,
+        choices=POLL_TYPES,
+        default=SINGLE
+    )
     published_date = models.DateTimeField(
         _('date published')
     )
-
-    @admin.display(
-        boolean=True,
-        ordering='-published_date',
-        description='Published recently?'
+    closed_date = models.DateTimeField(
+        _('date closed'),
+        null=True,
+        blank=True
     )
+    archived = models.BooleanField(default=False, editable=False)
+
     def was_published_recently(self):
         one_day_ago = timezone.now() - datetime.timedelta(days=1)
         return one_day_ago <= self.published_date <= timezone.now()
 
-    @admin.display(
-        description='Choices'
-    )
+    # Set the admin display options by hand, so importing the models
+    # does not import the admin site (see config.settings_public).
+    was_published_recently.boolean = True
+    was_published_recently.admin_order_field = '-published_date'
+    was_published_recently.short_description = 'Published recently?'
+
+    def is_closed(self):
+        if self.archived:
+            return True
+        return self.closed_date is not None \
+            and self.closed_date <= timezone.now()
+
+    def choices(self):
+        """Return the live choices, or the archived tallies
+        if the question has been moved to the archive.
+        """
+        if self.archived:
+            return self.archivedchoice_set.all()
+        return self.choice_set.all()
+
     def choice_numbers(self):
-        return self.choice_set.count()
+        # Use the counts annotated by the list views, if any.
+        if self.archived:
+            count = getattr(self, 'n_archived_choice', None)
+        else:
+            count = getattr(self, 'n_choice', None)
+        if count is None:
+            return self.choices().count()
+        return count
+
+    choice_numbers.short_description = 'Choices'
 
     def votes_count(self):
+        if getattr(self, 'n_votes', None) is not None:
+            return self.n_votes
         votes = 0
-        for choice in self.choice_set.all():
+        for choice in self.choices():
             votes += choice.votes
         return votes
 
+    @cached_property
+    def has_votes(self) -> bool:
+        """Return True if votes or ballots have been recorded."""
+        return Question.objects.filter(
+            models.Exists(Vote.objects.filter(
+                question_id=models.OuterRef('pk')
+            )) |
+            models.Exists(Ballot.objects.filter(
+                question=models.OuterRef('pk')
+            )),
+            pk=self.pk
+        ).exists()
+
     def sorted_choice(self):
-        return self.choice_set.order_by('-votes')
+        return self.choices().order_by('-votes')
 
     def __str__(self):
         return self.question_text
 
 
 class Choice(models.Model):
+    """A choice of a question. `votes_baseline` holds the votes counted
+    before the vote log and the ballots were kept, see `reconcile_votes`.
+    """
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE
+    )
+    choice_text = models.CharField(max_length=256)
+    votes = models.IntegerField(default=0)
+    votes_baseline = models.IntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return self.choice_text
+
+
+class ArchivedChoice(models.Model):
+    """Read-only final tally of a choice of an archived question.
+    `choice_id` is the id of the live choice, which the ballots refer to.
+    """
     question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE
     )
+    choice_id = models.BigIntegerField(null=True)
     choice_text = models.CharField(max_length=256)
     votes = models.IntegerField(default=0)
 
     def __str__(self):
         return self.choice_text
+
+
+class Ballot(models.Model):
+    """A multi-select or ranked ballot. `choices` is a packed array of
+    the ids of the chosen choices, in the order of preference,
+    see `polls.tally.pack_ballot`.
+    """
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE
+    )
+    choices = models.BinaryField()
+
+    def __str__(self):
+        return f'{self.question_id}:{bytes(self.choices).hex()}'
+
+
+class Vote(models.Model):
+    """A single choice vote of the vote log, the source of truth of
+    `Choice.votes`. Queued votes are applied to the counters by the
+    `process_votes` workers, the other votes were counted right away.
+    """
+    question_id = models.BigIntegerField()
+    choice_id = models.BigIntegerField(db_index=True)
+    created_date = models.DateTimeField(default=timezone.now)
+    queued = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f'{self.question_id}:{self.choice_id}'
+
+
+class VoteOffset(models.Model):
+    """Position of a consumer in the vote log: every vote
+    with a lower or equal id has been consumed.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}@{self.position}'
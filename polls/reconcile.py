@@ -0,0 +1,182 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from .http_cache import purge_question
+from .ingestion import pending_votes
+from .models import Ballot, Choice, Question, Vote, VoteOffset
+from .tally import unpack_ballot
+
+VOTES_MARK = 'reconcile-votes'
+BALLOTS_MARK = 'reconcile-ballots'
+BASELINE_MARK = 'reconcile-baseline'
+
+
+def applied_votes():
+    """Return the votes of the log already counted in `Choice.votes`:
+    the votes counted right away and the queued votes consumed by the
+    workers, without the votes cast after their poll closed and the
+    queued votes the workers dropped because the poll is not a single
+    choice poll.
+    """
+    questions = Question.objects.filter(pk=OuterRef('question_id'))
+    return Vote.objects.exclude(
+        pk__in=pending_votes().values('pk')
+    ).annotate(
+        closed_date=Subquery(questions.values('closed_date')),
+        poll_type=Subquery(questions.values('poll_type'))
+    ).filter(
+        Q(queued=False) | Q(poll_type=Question.SINGLE),
+        Q(closed_date__isnull=True) | Q(created_date__lt=F('closed_date'))
+    )
+
+
+def settled_vote_position() -> int:
+    """Return the id up to which the vote log is settled: every
+    queued vote before it has been consumed by the workers.
+    """
+    last_id = Vote.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+    pending = pending_votes().order_by('pk').values_list(
+        'pk', flat=True
+    ).first()
+    if pending is not None:
+        last_id = min(last_id, pending - 1)
+    return last_id
+
+
+def expected_votes(questions, baselines=True) -> dict:
+    """Return the expected `Choice.votes` of every choice of
+    `questions`, counted from the vote log and the ballots on top of
+    the baselines of the choices, unless `baselines` is False.
+    """
+    # Both kinds of records are counted whatever the poll type,
+    # a poll may have had another type when they were recorded.
+    expected = {}
+    poll_types = dict(questions)
+    choices = Choice.objects.filter(
+        question_id__in=poll_types
+    ).values_list('pk', 'votes_baseline')
+    for choice_id, baseline in choices:
+        expected[choice_id] = baseline if baselines else 0
+
+    votes = applied_votes().filter(
+        question_id__in=poll_types
+    ).values('choice_id').annotate(count=Count('pk')).order_by()
+    for row in votes:
+        if row['choice_id'] in expected:
+            expected[row['choice_id']] += row['count']
+
+    ballots = Ballot.objects.filter(
+        question_id__in=poll_types
+    ).values_list('question_id', 'choices')
+    for question_id, packed in ballots.iterator():
+        ballot = unpack_ballot(packed)
+        if poll_types[question_id] == Question.RANKED:
+            # Ranked choices count their first preferences.
+            ballot = ballot[:1]
+        for choice_id in ballot:
+            if choice_id in expected:
+                expected[choice_id] += 1
+    return expected
+
+
+def reconcile_questions(questions, repair=True) -> list:
+    """Compare the counters of the choices of `questions`, a list of
+    `(question_id, poll_type)`, to the vote records and repair them.
+    Return the `(choice_id, votes, expected)` of the drifted choices.
+    """
+    with transaction.atomic():
+        # Lock the counters, so the votes being applied are logged
+        # before the records are counted, like `record_baselines()`.
+        counters = list(Choice.objects.select_for_update().filter(
+            question_id__in=[question_id for question_id, _ in questions]
+        ).values_list('pk', 'question_id', 'votes'))
+        expected = expected_votes(questions)
+        drifts = []
+        drifted_questions = set()
+        for choice_id, question_id, votes in counters:
+            if votes != expected[choice_id]:
+                drifts.append((choice_id, votes, expected[choice_id]))
+                drifted_questions.add(question_id)
+        if repair:
+            for choice_id, votes, count in drifts:
+                # Apply the difference, so concurrent votes are kept.
+                Choice.objects.filter(pk=choice_id).update(
+                    votes=F('votes') + (count - votes)
+                )
+            for question_id in drifted_questions:
+                purge_question(question_id)
+    return drifts
+
+
+def has_baselines() -> bool:
+    return VoteOffset.objects.filter(name=BASELINE_MARK).exists()
+
+
+def record_baselines(questions, save=True) -> int:
+    """Record the votes of the choices of `questions` that the vote log
+    and the ballots do not account for, the votes counted before they
+    were kept, as the baselines of the choices.
+    Return the number of choices with a baseline.
+    """
+    with transaction.atomic():
+        # Lock the counters, so the votes being applied are logged
+        # before the records are counted.
+        counters = list(Choice.objects.select_for_update().filter(
+            question_id__in=[question_id for question_id, _ in questions]
+        ).values_list('pk', 'votes'))
+        logged = expected_votes(questions, baselines=False)
+        baselined = 0
+        for choice_id, votes in counters:
+            baseline = votes - logged[choice_id]
+            if not baseline:
+                continue
+            baselined += 1
+            if save:
+                Choice.objects.filter(pk=choice_id).update(
+                    votes_baseline=baseline
+                )
+    return baselined
+
+
+def save_baseline_mark(votes_position: int):
+    VoteOffset.objects.get_or_create(
+        name=BASELINE_MARK, defaults={'position': votes_position}
+    )
+
+
+def questions_to_reconcile(full: bool):
+    """Return the live questions to reconcile and the new high-water
+    marks `(votes_position, ballots_position)`. Unless `full`, only the
+    questions with new votes or ballots since the last run are returned.
+    """
+    marks = dict(VoteOffset.objects.filter(
+        name__in=[VOTES_MARK, BALLOTS_MARK]
+    ).values_list('name', 'position'))
+    votes_position = settled_vote_position()
+    ballots_position = Ballot.objects.aggregate(
+        last_id=Max('pk')
+    )['last_id'] or 0
+    questions = Question.objects.filter(archived=False)
+    if not full:
+        new_votes = Vote.objects.filter(
+            pk__gt=marks.get(VOTES_MARK, 0),
+            pk__lte=votes_position
+        ).values('question_id')
+        new_ballots = Ballot.objects.filter(
+            pk__gt=marks.get(BALLOTS_MARK, 0),
+            pk__lte=ballots_position
+        ).values('question_id')
+        questions = questions.filter(
+            Q(pk__in=new_votes) | Q(pk__in=new_ballots)
+        )
+    questions = questions.order_by('pk').values_list('pk', 'poll_type')
+    return questions, (votes_position, ballots_position)
+
+
+def save_marks(votes_position: int, ballots_position: int):
+    for name, position in (
+        (VOTES_MARK, votes_position),
+        (BALLOTS_MARK, ballots_position),
+    ):
+        VoteOffset.objects.update_or_create(
+            name=name, defaults={'position': position}
+        )
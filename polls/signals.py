@@ -0,0 +1,27 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .http_cache import purge_question
+from .models import Choice, Question
+from .tally import runoff_cache_key, tally_cache_key
+
+
+@receiver(post_delete, sender=Question)
+def drop_tally_cache(sender, instance, **kwargs):
+    cache.delete_many([
+        tally_cache_key(instance.pk), runoff_cache_key(instance.pk)
+    ])
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def purge_edited_question(sender, instance, **kwargs):
+    purge_question(instance.pk, index=True)
+
+
+# Deleted choices are purged with their question: the admin saves the
+# question along with its choices, and archiving purges it. Without a
+# delete receiver, Django deletes the choices in a single query.
+@receiver(post_save, sender=Choice)
+def purge_edited_choice(sender, instance, **kwargs):
+    purge_question(instance.question_id, index=True)
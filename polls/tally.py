@@ -0,0 +1,172 @@
+from array import array
+from collections import Counter
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .http_cache import purge_question
+from .models import Ballot, Choice, Question
+
+# Choice ids are packed as unsigned 64-bit integers, so the ballots
+# stay valid when choices are added or deleted.
+BALLOT_TYPECODE = 'Q'
+
+
+def pack_ballot(choice_ids) -> bytes:
+    return array(BALLOT_TYPECODE, choice_ids).tobytes()
+
+
+def unpack_ballot(packed) -> tuple:
+    ballot = array(BALLOT_TYPECODE)
+    ballot.frombytes(packed)
+    return tuple(ballot)
+
+
+def group_ballots(packed_ballots) -> Counter:
+    """Return a counter of the identical ballots of `packed_ballots`."""
+    return Counter(unpack_ballot(packed) for packed in packed_ballots)
+
+
+def instant_runoff(ballots: Counter, candidates: int):
+    """Run the instant-runoff rounds on grouped ranked `ballots`
+    and return `(winner, rounds)`.
+
+    Every round is a `(tallies, eliminated)` pair, `tallies` maps
+    the continuing candidates to their votes. Only the ballots of the
+    eliminated candidate are moved to their next preference, so every
+    ballot is read once in total across the rounds.
+    """
+    groups = list(ballots.items())
+    positions = [0] * len(groups)
+    tallies = [0] * candidates
+    piles = [[] for _ in range(candidates)]
+    for group, (ballot, count) in enumerate(groups):
+        if ballot:
+            piles[ballot[0]].append(group)
+            tallies[ballot[0]] += count
+    continuing = list(range(candidates))
+    rounds = []
+    while continuing:
+        total = sum(tallies[candidate] for candidate in continuing)
+        if total == 0:
+            return None, rounds
+        snapshot = {
+            candidate: tallies[candidate] for candidate in continuing
+        }
+        leader = max(continuing, key=tallies.__getitem__)
+        if tallies[leader] * 2 > total or len(continuing) == 1:
+            rounds.append((snapshot, None))
+            return leader, rounds
+        # Ties are broken in favour of the earlier choices.
+        loser = min(reversed(continuing), key=tallies.__getitem__)
+        rounds.append((snapshot, loser))
+        continuing.remove(loser)
+        for group in piles[loser]:
+            ballot, count = groups[group]
+            position = positions[group] + 1
+            while position < len(ballot) \
+                    and tallies[ballot[position]] is None:
+                position += 1
+            positions[group] = position
+            if position < len(ballot):
+                piles[ballot[position]].append(group)
+                tallies[ballot[position]] += count
+        piles[loser] = []
+        # None marks the eliminated candidates.
+        tallies[loser] = None
+    return None, rounds
+
+
+def cast_ballot(question: Question, choice_ids: list) -> Ballot:
+    """Store a multi-select or ranked ballot of `question`.
+    Raise ValueError if a choice is unknown or chosen twice.
+    """
+    choice_pks = set(question.choice_set.values_list('pk', flat=True))
+    if not choice_ids or len(set(choice_ids)) != len(choice_ids) \
+            or not choice_pks.issuperset(choice_ids):
+        raise ValueError("Invalid ballot.")
+    if question.poll_type == Question.RANKED:
+        # The counter of a ranked choice holds its first preferences.
+        counted = choice_ids[:1]
+    else:
+        counted = choice_ids
+    with transaction.atomic():
+        Choice.objects.filter(pk__in=counted).update(votes=F('votes') + 1)
+        purge_question(question.pk)
+        return Ballot.objects.create(
+            question=question,
+            choices=pack_ballot(choice_ids)
+        )
+
+
+def tally_cache_key(question_id: int) -> str:
+    return f'polls:ballots:{question_id}'
+
+
+def runoff_cache_key(question_id: int) -> str:
+    return f'polls:runoff:{question_id}'
+
+
+def question_runoff(question: Question):
+    """Return `(winner, rounds)` of the ranked `question`, with choices
+    instead of indexes, or archived choices once the question has been
+    moved to the archive.
+
+    The result is cached per question along with the last counted
+    ballot id and the counted choices, and reused until new ballots
+    are cast or the choices change. The grouped ballots are cached
+    apart, so only the new ballots are read to update the result.
+    """
+    if question.archived:
+        choices = list(question.choices().order_by('choice_id'))
+        choice_ids = [choice.choice_id for choice in choices]
+    else:
+        choices = list(question.choices().order_by('pk'))
+        choice_ids = [choice.pk for choice in choices]
+    new_ballots = Ballot.objects.filter(question=question)
+    cached = cache.get(runoff_cache_key(question.pk))
+    if cached is not None:
+        last_id, counted_ids, result = cached
+        if counted_ids == choice_ids \
+                and not new_ballots.filter(pk__gt=last_id).exists():
+            return runoff_choices(result, choices)
+
+    key = tally_cache_key(question.pk)
+    last_id, ballots = cache.get(key) or (0, Counter())
+    counted = last_id
+    new_ballots = new_ballots.filter(
+        pk__gt=last_id
+    ).order_by('pk').values_list('pk', 'choices')
+    for last_id, packed in new_ballots.iterator():
+        ballots[unpack_ballot(packed)] += 1
+    if last_id != counted:
+        cache.set(key, (last_id, ballots), None)
+
+    indexes = {pk: index for index, pk in enumerate(choice_ids)}
+    grouped = Counter()
+    for ballot, count in ballots.items():
+        # Skip the deleted choices, in favour of the next preferences.
+        grouped[
+            tuple(indexes[pk] for pk in ballot if pk in indexes)
+        ] += count
+    result = instant_runoff(grouped, len(choices))
+    cache.set(
+        runoff_cache_key(question.pk), (last_id, choice_ids, result), None
+    )
+    return runoff_choices(result, choices)
+
+
+def runoff_choices(result, choices):
+    """Replace the indexes of the `(winner, rounds)` of `instant_runoff`
+    with the `choices`.
+    """
+    winner, rounds = result
+    return (
+        choices[winner] if winner is not None else None,
+        [
+            (
+                [(choices[index], votes) for index, votes in tallies.items()],
+                choices[loser] if loser is not None else None
+            )
+            for tallies, loser in rounds
+        ]
+    )
@@ -0,0 +1,134 @@
+"""
+Query-count and latency budgets of the polls views and admin pages.
+
+Run only these tests with `python manage.py test --tag performance`,
+or skip them with `--exclude-tag performance`.
+"""
+import datetime
+import time
+from contextlib import contextmanager
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import Question, Choice
+
+QUESTIONS = 300
+CHOICES_PER_QUESTION = 4
+LARGE_QUESTION_CHOICES = 2000
+
+
+class PerformanceTestCase(TestCase):
+    @contextmanager
+    def assertMaxQueries(self, limit: int):
+        """Fail with the executed SQL if the block runs more than
+        `limit` queries.
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context)
+        if executed > limit:
+            queries = '\n'.join(
+                f"{number}. {query['sql']}"
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f"{executed} queries executed, at most {limit} expected:\n"
+                f"{queries}"
+            )
+
+    @contextmanager
+    def assertMaxDuration(self, seconds: float):
+        """Fail if the block runs longer than `seconds`."""
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        if elapsed > seconds:
+            self.fail(
+                f"Took {elapsed:.3f}s, at most {seconds:.3f}s expected."
+            )
+
+
+@tag('performance')
+class ViewsPerformanceTests(PerformanceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        questions = Question.objects.bulk_create([
+            Question(
+                question_text=f"Question {number}",
+                published_date=now - datetime.timedelta(minutes=number)
+            )
+            for number in range(QUESTIONS)
+        ])
+        Choice.objects.bulk_create([
+            Choice(
+                question=question,
+                choice_text=f"Choice {number}",
+                votes=number
+            )
+            for question in questions
+            for number in range(CHOICES_PER_QUESTION)
+        ])
+        cls.question = questions[0]
+        cls.large_question = Question.objects.create(
+            question_text="Large question",
+            published_date=now
+        )
+        Choice.objects.bulk_create([
+            Choice(
+                question=cls.large_question,
+                choice_text=f"Choice {number}"
+            )
+            for number in range(LARGE_QUESTION_CHOICES)
+        ])
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+
+    def test_index(self):
+        with self.assertMaxQueries(1), self.assertMaxDuration(0.5):
+            response = self.client.get(reverse('polls:index'))
+        self.assertEqual(len(response.context['latest_questions']), 10)
+
+    def test_detail(self):
+        url = reverse('polls:detail', args=(self.question.id,))
+        with self.assertMaxQueries(2), self.assertMaxDuration(0.5):
+            self.client.get(url)
+
+    def test_results(self):
+        url = reverse('polls:results', args=(self.question.id,))
+        with self.assertMaxQueries(2), self.assertMaxDuration(0.5):
+            self.client.get(url)
+
+    def test_admin_changelist(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:polls_question_changelist')
+        # Session, user, collections filter, the two paginator
+        # counts and the page.
+        with self.assertMaxQueries(6), self.assertMaxDuration(1.0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_change_page(self):
+        self.client.force_login(self.admin)
+        url = reverse(
+            'admin:polls_question_change', args=(self.question.id,)
+        )
+        # Including the check for recorded votes of the poll type.
+        with self.assertMaxQueries(10), self.assertMaxDuration(1.0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_change_page_with_many_choices(self):
+        self.client.force_login(self.admin)
+        url = reverse(
+            'admin:polls_question_change', args=(self.large_question.id,)
+        )
+        with self.assertMaxQueries(10), self.assertMaxDuration(1.0):
+            response = self.client.get(url, {'choice_page': 3})
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.initial_forms), 50)
+        self.assertContains(response, "Choices 101-150 of 2000")
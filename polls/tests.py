@@ -1,8 +1,29 @@
 import datetime
-from django.test import TestCase
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from collections import Counter
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from .models import Question, Choice
+from .archive import archive_closed_questions, archive_question
+from .http_cache import local_proxy
+from .ingestion import (
+    apply_vote, enqueue_vote, pending_votes, pending_votes_estimate,
+    process_batch
+)
+from .models import (
+    ArchivedChoice, Ballot, Collection, Question, Choice, Vote, VoteOffset
+)
+from .tally import cast_ballot, instant_runoff, pack_ballot, unpack_ballot
+from .tokens import make_vote_token
 
 
 def create_question(question_text: str, days: int) -> Question:
@@ -29,6 +50,14 @@ def create_choice(question: Question, choice_text: str) -> Choice:
     )
 
 
+purged_keys = []
+
+
+def record_purge(keys):
+    """Purge backend recording the purged keys."""
+    purged_keys.append(keys)
+
+
 class QuestionModelTests(TestCase):
     def test_was_published_recently_with_future_question(self):
         """
@@ -374,3 +403,975 @@ class QuestionResultViewTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
         self.assertEqual(question.votes_count(), 0)
+
+
+class CollectionIndexViewTests(TestCase):
+    def test_collection_only_lists_its_questions(self):
+        collection = Collection.objects.create(name="Sport", slug="sport")
+        question1 = create_question(
+            question_text="In collection.",
+            days=-5
+        )
+        question1.collection = collection
+        question1.save()
+        create_choice(question1, "choice1")
+        create_choice(question1, "choice2")
+        question2 = create_question(
+            question_text="Not in collection.",
+            days=-5
+        )
+        create_choice(question2, "choice1")
+        create_choice(question2, "choice2")
+        url = reverse('polls:collection', args=(collection.slug,))
+        response = self.client.get(url)
+        self.assertContains(response, collection.name)
+        self.assertQuerysetEqual(
+            response.context['latest_questions'],
+            [question1],
+        )
+
+    def test_unknown_collection(self):
+        url = reverse('polls:collection', args=("unknown",))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
+class ArchiveTests(TestCase):
+    def _closed_question(self):
+        question = create_question(
+            question_text="Closed question.",
+            days=-5
+        )
+        question.closed_date = timezone.now() - datetime.timedelta(days=1)
+        question.save()
+        choice1 = create_choice(question, "choice1")
+        create_choice(question, "choice2")
+        choice1.votes = 3
+        choice1.save()
+        return question
+
+    def test_archive_moves_choices(self):
+        question = self._closed_question()
+        self.assertEqual(archive_question(question), 2)
+        self.assertFalse(Choice.objects.filter(question=question).exists())
+        self.assertEqual(
+            ArchivedChoice.objects.filter(question=question).count(), 2
+        )
+        question.refresh_from_db()
+        self.assertIs(question.archived, True)
+        self.assertEqual(question.votes_count(), 3)
+
+    def test_results_read_from_archive(self):
+        question = self._closed_question()
+        archive_question(question)
+        url = reverse('polls:results', args=(question.id,))
+        response = self.client.get(url)
+        self.assertContains(response, "choice1")
+        self.assertContains(response, "3 votes")
+        self.assertNotContains(response, "Vote Again")
+
+    def test_archive_waits_for_queued_votes(self):
+        question = self._closed_question()
+        choice2 = question.choice_set.get(choice_text="choice2")
+        Vote.objects.create(
+            question_id=question.id,
+            choice_id=choice2.id,
+            created_date=question.closed_date - datetime.timedelta(hours=1)
+        )
+        self.assertEqual(archive_closed_questions(), (0, 0))
+        self.assertEqual(process_batch(), 1)
+        self.assertEqual(archive_closed_questions(), (1, 2))
+        self.assertEqual(
+            ArchivedChoice.objects.get(choice_text="choice2").votes, 1
+        )
+
+    def test_index_lists_archived_question(self):
+        question = self._closed_question()
+        archive_question(question)
+        response = self.client.get(reverse('polls:index'))
+        self.assertQuerysetEqual(
+            response.context['latest_questions'],
+            [question],
+        )
+        self.assertEqual(
+            response.context['latest_questions'][0].votes_count(), 3
+        )
+        self.assertContains(response, "3 votes")
+
+    def test_detail_of_archived_question_redirects(self):
+        question = self._closed_question()
+        archive_question(question)
+        url = reverse('polls:detail', args=(question.id,))
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, reverse('polls:results', args=(question.id,))
+        )
+
+    def test_vote_on_closed_question(self):
+        question = self._closed_question()
+        choice = question.choice_set.get(choice_text="choice2")
+        url = reverse('polls:detail', args=(question.id,))
+        response = self.client.post(url, {"choice": str(choice.id)})
+        self.assertContains(response, "This poll is closed.")
+        self.assertEqual(question.votes_count(), 3)
+
+    def test_archive_polls_command(self):
+        question = self._closed_question()
+        open_question = create_question(
+            question_text="Open question.",
+            days=-5
+        )
+        create_choice(open_question, "choice1")
+        out = StringIO()
+        call_command('archive_polls', stdout=out)
+        self.assertIn("Archived 1 poll(s) with 2 choice(s).", out.getvalue())
+        question.refresh_from_db()
+        open_question.refresh_from_db()
+        self.assertIs(question.archived, True)
+        self.assertIs(open_question.archived, False)
+
+
+@override_settings(
+    ROOT_URLCONF='config.urls_public',
+    MIDDLEWARE=[
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+)
+class PublicOnlyTests(TestCase):
+    def test_vote_without_authentication(self):
+        """
+        The public-only stack has no `request.user`, voting still works.
+        """
+        question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        create_choice(question, "choice1")
+        choice2 = create_choice(question, "choice2")
+        url = reverse('polls:detail', args=(question.id,))
+        self.assertContains(self.client.get(url), question.question_text)
+        response = self.client.post(url, {"choice": str(choice2.id)})
+        self.assertRedirects(
+            response, reverse('polls:results', args=(question.id,))
+        )
+        self.assertEqual(question.votes_count(), 1)
+
+    def test_no_admin_urls(self):
+        response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProfileStartupCommandTests(TestCase):
+    def test_report(self):
+        out = StringIO()
+        call_command(
+            'profile_startup',
+            entry='config.wsgi_public',
+            path='/missing/',
+            stdout=out
+        )
+        self.assertIn("Startup of config.wsgi_public", out.getvalue())
+        self.assertIn("AppConfig.ready() per app", out.getvalue())
+        self.assertNotIn("django.contrib.admin", out.getvalue())
+
+
+class VoteViewTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        self.choice1 = create_choice(self.question, "choice1")
+        self.choice2 = create_choice(self.question, "choice2")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def test_detail_embeds_vote_token(self):
+        url = reverse('polls:detail', args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertContains(response, 'name="vote_token"')
+        self.assertContains(response, self.url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_vote_queries(self):
+        """
+        A vote only updates the counter and records it in the vote log,
+        without any session query.
+        """
+        data = {
+            "choice": str(self.choice2.id),
+            "vote_token": make_vote_token(self.question.id),
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+        self.assertEqual(
+            [
+                query['sql'].split()[0]
+                for query in queries.captured_queries
+                if 'SAVEPOINT' not in query['sql']
+            ],
+            ['UPDATE', 'INSERT']
+        )
+        self.assertRedirects(
+            response, reverse('polls:results', args=(self.question.id,))
+        )
+        self.assertEqual(self.question.votes_count(), 1)
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_vote_with_invalid_token(self):
+        other_question = create_question(
+            question_text="Other question",
+            days=-5
+        )
+        data = {
+            "choice": str(self.choice2.id),
+            "vote_token": make_vote_token(other_question.id),
+        }
+        response = self.client.post(self.url, data)
+        self.assertContains(response, "Your voting form has expired")
+        self.assertEqual(self.question.votes_count(), 0)
+
+    def test_vote_for_choice_of_other_question(self):
+        other_question = create_question(
+            question_text="Other question",
+            days=-5
+        )
+        other_choice = create_choice(other_question, "other")
+        data = {
+            "choice": str(other_choice.id),
+            "vote_token": make_vote_token(self.question.id),
+        }
+        response = self.client.post(self.url, data)
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+        other_choice.refresh_from_db()
+        self.assertEqual(other_choice.votes, 0)
+
+    def test_vote_on_closed_question(self):
+        self.question.closed_date = timezone.now()
+        self.question.save()
+        data = {
+            "choice": str(self.choice2.id),
+            "vote_token": make_vote_token(self.question.id),
+        }
+        response = self.client.post(self.url, data)
+        self.assertContains(response, "This poll is closed.")
+        self.assertEqual(self.question.votes_count(), 0)
+
+
+@override_settings(POLLS_VOTE_QUEUE=True)
+class VoteQueueTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        self.choice1 = create_choice(self.question, "choice1")
+        self.choice2 = create_choice(self.question, "choice2")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def _vote(self, choice):
+        return self.client.post(self.url, {
+            "choice": str(choice.id),
+            "vote_token": make_vote_token(self.question.id),
+        })
+
+    def test_vote_is_queued(self):
+        response = self._vote(self.choice2)
+        self.assertRedirects(
+            response, reverse('polls:results', args=(self.question.id,))
+        )
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(self.question.votes_count(), 0)
+
+    def test_process_batch_coalesces_votes(self):
+        self._vote(self.choice1)
+        self._vote(self.choice2)
+        self._vote(self.choice2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(process_batch(), 3)
+        choice_updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "polls_choice"')
+        ]
+        self.assertEqual(len(choice_updates), 2)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (1, 2))
+
+    def test_votes_are_applied_once(self):
+        self._vote(self.choice1)
+        self.assertEqual(process_batch(batch_size=1), 1)
+        self._vote(self.choice1)
+        self.assertEqual(process_batch(), 1)
+        self.assertEqual(process_batch(), 0)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 2)
+        self.assertEqual(
+            VoteOffset.objects.get().position,
+            Vote.objects.latest('pk').pk
+        )
+
+    def test_votes_after_close_are_dropped(self):
+        self._vote(self.choice1)
+        self.question.closed_date = timezone.now()
+        self.question.save()
+        Vote.objects.create(
+            question_id=self.question.id,
+            choice_id=self.choice1.id
+        )
+        self.assertEqual(process_batch(), 2)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    @override_settings(POLLS_VOTE_QUEUE_MAX_LAG=1)
+    def test_back_pressure(self):
+        self._vote(self.choice1)
+        response = self._vote(self.choice1)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        process_batch()
+        response = self._vote(self.choice1)
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(POLLS_VOTE_QUEUE_PARTITIONS=2)
+    def test_partitions(self):
+        other_question = create_question(
+            question_text="Other question",
+            days=-5
+        )
+        other_choice = create_choice(other_question, "other")
+        self._vote(self.choice1)
+        Vote.objects.create(
+            question_id=other_question.id,
+            choice_id=other_choice.id
+        )
+        self.assertEqual(process_batch(0, 2) + process_batch(1, 2), 2)
+        self.assertEqual(process_batch(0, 2) + process_batch(1, 2), 0)
+        out = StringIO()
+        call_command('vote_queue_status', stdout=out)
+        self.assertIn("votes-0-of-2", out.getvalue())
+        self.assertIn("Total pending: 0", out.getvalue())
+
+    def test_changing_partitions_applies_votes_once(self):
+        other_question = create_question(
+            question_text="Other question",
+            days=-5
+        )
+        other_choice = create_choice(other_question, "other")
+        for _ in range(5):
+            self._vote(self.choice1)
+        Vote.objects.create(
+            question_id=other_question.id,
+            choice_id=other_choice.id
+        )
+        # Only the partition of one of the questions catches up.
+        process_batch(self.question.id % 2, 2)
+        with self.settings(POLLS_VOTE_QUEUE_PARTITIONS=3):
+            self.assertEqual(pending_votes_estimate(), 6)
+            for partition in range(3):
+                process_batch(partition, 3)
+            self.assertEqual(pending_votes().count(), 0)
+            # The idle partitions catch up on their next batch.
+            for partition in range(3):
+                self.assertEqual(process_batch(partition, 3), 0)
+            self.assertEqual(pending_votes_estimate(), 0)
+        self.choice1.refresh_from_db()
+        other_choice.refresh_from_db()
+        self.assertEqual((self.choice1.votes, other_choice.votes), (5, 1))
+
+    @override_settings(
+        POLLS_VOTE_QUEUE_PARTITIONS=2,
+        POLLS_VOTE_QUEUE_MAX_LAG=2
+    )
+    def test_back_pressure_without_worker_offset(self):
+        other_question = create_question(
+            question_text="Other question",
+            days=-5
+        )
+        other_choice = create_choice(other_question, "other")
+        for _ in range(2):
+            Vote.objects.create(
+                question_id=other_question.id,
+                choice_id=other_choice.id
+            )
+        self._vote(self.choice1)
+        # The partition of the other question has no worker yet.
+        process_batch(self.question.id % 2, 2)
+        self.assertEqual(pending_votes_estimate(), 2)
+        response = self._vote(self.choice1)
+        self.assertEqual(response.status_code, 503)
+
+    def test_process_votes_command(self):
+        self._vote(self.choice1)
+        out = StringIO()
+        call_command('process_votes', once=True, stdout=out)
+        self.assertIn("applied 1 vote(s)", out.getvalue())
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+
+@override_settings(POLLS_VOTE_QUEUE=True)
+class ConcurrentVoteQueueTests(TransactionTestCase):
+    def test_worker_with_concurrent_producers(self):
+        question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        choice = create_choice(question, "choice1")
+
+        def produce():
+            try:
+                for _ in range(100):
+                    # Threads share the cache of the in-memory test
+                    # database, where a locked table fails at once
+                    # instead of waiting like a database file does.
+                    while True:
+                        try:
+                            enqueue_vote(question.id, choice.id)
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)
+            finally:
+                connection.close()
+
+        producers = [threading.Thread(target=produce) for _ in range(4)]
+        for producer in producers:
+            producer.start()
+        while any(producer.is_alive() for producer in producers):
+            call_command(
+                'process_votes', once=True, batch_size=50,
+                stdout=StringIO(), stderr=StringIO()
+            )
+        call_command('process_votes', once=True, stdout=StringIO())
+        choice.refresh_from_db()
+        self.assertEqual(choice.votes, 400)
+        self.assertEqual(pending_votes().count(), 0)
+
+
+class InstantRunoffTests(TestCase):
+    def test_pack_ballot(self):
+        self.assertEqual(unpack_ballot(pack_ballot([2, 0, 1])), (2, 0, 1))
+        self.assertEqual(len(pack_ballot([2, 0, 1])), 24)
+
+    def test_majority_in_first_round(self):
+        winner, rounds = instant_runoff(Counter({(0, 1): 3, (1,): 2}), 2)
+        self.assertEqual(winner, 0)
+        self.assertEqual(rounds, [({0: 3, 1: 2}, None)])
+
+    def test_transfers_eliminated_ballots(self):
+        ballots = Counter({(0,): 4, (1, 2): 3, (2, 1): 2, (2,): 1})
+        winner, rounds = instant_runoff(ballots, 3)
+        self.assertEqual(winner, 1)
+        self.assertEqual(rounds, [
+            ({0: 4, 1: 3, 2: 3}, 2),
+            ({0: 4, 1: 5}, None),
+        ])
+
+    def test_exhausted_ballots(self):
+        ballots = Counter({(0,): 3, (1,): 2, (2,): 1})
+        winner, rounds = instant_runoff(ballots, 3)
+        self.assertEqual(winner, 0)
+        self.assertEqual(rounds[-1], ({0: 3, 1: 2}, None))
+
+    def test_no_ballots(self):
+        self.assertEqual(instant_runoff(Counter(), 3), (None, []))
+
+
+class BallotViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        self.choice1 = create_choice(self.question, "choice1")
+        self.choice2 = create_choice(self.question, "choice2")
+        self.choice3 = create_choice(self.question, "choice3")
+        self.url = reverse('polls:vote', args=(self.question.id,))
+
+    def _set_type(self, poll_type):
+        self.question.poll_type = poll_type
+        self.question.save()
+
+    def _vote(self, data):
+        data['vote_token'] = make_vote_token(
+            self.question.id, self.question.poll_type
+        )
+        return self.client.post(self.url, data)
+
+    def test_approval_ballot(self):
+        self._set_type(Question.APPROVAL)
+        response = self.client.get(
+            reverse('polls:detail', args=(self.question.id,))
+        )
+        self.assertContains(response, 'type="checkbox"')
+        self._vote({"choice": [str(self.choice1.id), str(self.choice3.id)]})
+        self.assertEqual(
+            [choice.votes for choice in self.question.choice_set.all()],
+            [1, 0, 1]
+        )
+        self.assertEqual(
+            unpack_ballot(Ballot.objects.get().choices),
+            (self.choice1.id, self.choice3.id)
+        )
+
+    def test_ranked_ballots_and_results(self):
+        self._set_type(Question.RANKED)
+        results = reverse('polls:results', args=(self.question.id,))
+        self._vote({
+            f"rank-{self.choice1.id}": "1",
+            f"rank-{self.choice2.id}": "2",
+        })
+        self._vote({
+            f"rank-{self.choice2.id}": "1",
+        })
+        response = self._vote({
+            f"rank-{self.choice3.id}": "1",
+            f"rank-{self.choice1.id}": "2",
+        })
+        self.assertRedirects(response, results)
+        response = self.client.get(results)
+        self.assertContains(response, "Winner: choice1")
+        self.assertEqual(len(response.context['rounds']), 2)
+        # Only the new ballot is read on the next results.
+        self._vote({f"rank-{self.choice2.id}": "1"})
+        self._vote({f"rank-{self.choice2.id}": "1"})
+        response = self.client.get(results)
+        self.assertContains(response, "Winner: choice2")
+
+    def test_runoff_is_cached_until_new_ballots(self):
+        self._set_type(Question.RANKED)
+        results = reverse('polls:results', args=(self.question.id,))
+        self._vote({
+            f"rank-{self.choice1.id}": "1",
+            f"rank-{self.choice2.id}": "2",
+        })
+        self._vote({f"rank-{self.choice2.id}": "1"})
+        self._vote({f"rank-{self.choice2.id}": "1"})
+        self._vote({f"rank-{self.choice3.id}": "1"})
+        self.assertContains(self.client.get(results), "Winner: choice2")
+        with mock.patch.object(cache, 'set') as cache_set:
+            response = self.client.get(results)
+        cache_set.assert_not_called()
+        self.assertContains(response, "Winner: choice2")
+        # Deleting a choice changes the result without new ballots.
+        self.choice2.delete()
+        self.assertContains(self.client.get(results), "Winner: choice1")
+
+    def test_deleted_choice_keeps_ballots(self):
+        self._set_type(Question.RANKED)
+        call_command('reconcile_votes', stdout=StringIO())
+        for _ in range(3):
+            self._vote({f"rank-{self.choice3.id}": "1"})
+        self._vote({
+            f"rank-{self.choice1.id}": "1",
+            f"rank-{self.choice2.id}": "2",
+        })
+        self.choice1.delete()
+        results = reverse('polls:results', args=(self.question.id,))
+        response = self.client.get(results)
+        self.assertContains(response, "Winner: choice3")
+        self.assertEqual(
+            response.context['rounds'][0][0],
+            [(self.choice2, 1), (self.choice3, 3)]
+        )
+        call_command('reconcile_votes', '--full', stdout=StringIO())
+        self.assertEqual(
+            [choice.votes for choice in self.question.choice_set.all()],
+            [0, 3]
+        )
+
+    def test_stale_single_choice_token(self):
+        token = make_vote_token(self.question.id, Question.SINGLE)
+        self._set_type(Question.RANKED)
+        response = self.client.post(self.url, {
+            "choice": str(self.choice1.id),
+            "vote_token": token,
+        })
+        self.assertContains(response, "Your voting form has expired")
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_stale_ranked_token(self):
+        token = make_vote_token(self.question.id, Question.RANKED)
+        response = self.client.post(self.url, {
+            f"rank-{self.choice1.id}": "1",
+            "vote_token": token,
+        })
+        self.assertContains(response, "Your voting form has expired")
+        self.assertFalse(Ballot.objects.exists())
+
+    @override_settings(POLLS_VOTE_QUEUE=True)
+    def test_stale_queued_vote_is_dropped(self):
+        self._vote({"choice": str(self.choice1.id)})
+        self._set_type(Question.RANKED)
+        self.assertEqual(process_batch(), 1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+
+    def test_archived_ranked_results(self):
+        self._set_type(Question.RANKED)
+        for _ in range(2):
+            self._vote({f"rank-{self.choice3.id}": "1"})
+        self._vote({
+            f"rank-{self.choice1.id}": "1",
+            f"rank-{self.choice3.id}": "2",
+        })
+        self._vote({f"rank-{self.choice2.id}": "1"})
+        self.question.closed_date = timezone.now()
+        self.question.save()
+        archive_question(self.question)
+        cache.clear()
+        response = self.client.get(
+            reverse('polls:results', args=(self.question.id,))
+        )
+        self.assertContains(response, "Winner: choice3")
+        self.assertEqual(len(response.context['rounds']), 2)
+
+    def test_ranked_ballot_with_duplicate_rank(self):
+        self._set_type(Question.RANKED)
+        response = self._vote({
+            f"rank-{self.choice1.id}": "1",
+            f"rank-{self.choice2.id}": "1",
+        })
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+        self.assertFalse(Ballot.objects.exists())
+
+    def test_ballot_with_choice_of_other_question(self):
+        self._set_type(Question.APPROVAL)
+        other_question = create_question(
+            question_text="Other question",
+            days=-5
+        )
+        other_choice = create_choice(other_question, "other")
+        response = self._vote({"choice": [str(other_choice.id)]})
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+        self.assertFalse(Ballot.objects.exists())
+
+
+@override_settings(POLLS_PURGE_BACKEND='polls.http_cache.local_proxy_purge')
+class HTTPCacheTests(TestCase):
+    def setUp(self):
+        local_proxy.clear()
+        # Send the purges of the fixtures, the test transaction would
+        # collect the purges of the tests with them.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question = create_question(
+                question_text="The sample question",
+                days=-5
+            )
+            self.choice1 = create_choice(self.question, "choice1")
+            self.choice2 = create_choice(self.question, "choice2")
+        self.results = reverse('polls:results', args=(self.question.id,))
+
+    def test_anonymous_headers(self):
+        for url in (
+            reverse('polls:index'),
+            reverse('polls:detail', args=(self.question.id,)),
+            self.results,
+        ):
+            response = self.client.get(url)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('max-age=60', response['Cache-Control'])
+            self.assertEqual(response['Vary'], 'Cookie')
+            self.assertEqual(response['Surrogate-Control'], 'max-age=600')
+        self.assertEqual(
+            response['Surrogate-Key'], f'question-{self.question.id}'
+        )
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(
+            response['Surrogate-Key'],
+            f'polls-index question-{self.question.id}'
+        )
+
+    def test_vote_purges_the_index(self):
+        index = reverse('polls:index')
+        response = local_proxy.get(self.client, index)
+        self.assertContains(response, "0 vote")
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_vote(self.question.id, self.choice1.id)
+        response = local_proxy.get(self.client, index)
+        self.assertContains(response, "1 vote")
+
+    def test_logged_in_user_is_not_cached(self):
+        self.client.cookies['sessionid'] = 'session'
+        response = self.client.get(self.results)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Surrogate-Key', response)
+
+    @override_settings(POLLS_STATELESS_VOTING=False)
+    def test_csrf_voting_form_is_not_cached(self):
+        response = self.client.get(
+            reverse('polls:detail', args=(self.question.id,))
+        )
+        self.assertIn('csrftoken', response.cookies)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertNotIn('Surrogate-Key', response)
+        response = self.client.get(self.results)
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_vote_purges_the_results(self):
+        response = local_proxy.get(self.client, self.results)
+        self.assertContains(response, "0 vote")
+        with self.assertNumQueries(0):
+            local_proxy.get(self.client, self.results)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('polls:vote', args=(self.question.id,)),
+                {
+                    "choice": str(self.choice1.id),
+                    "vote_token": make_vote_token(self.question.id),
+                }
+            )
+        response = local_proxy.get(self.client, self.results)
+        self.assertContains(response, "1 vote")
+
+    @override_settings(POLLS_PURGE_BACKEND='polls.tests.record_purge')
+    def test_one_purge_per_transaction(self):
+        Choice.objects.bulk_create([
+            Choice(question=self.question, choice_text=f"choice{number}")
+            for number in range(200)
+        ])
+        self.question.closed_date = timezone.now()
+        purged_keys.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.save()
+            archive_question(self.question)
+        self.assertEqual(purged_keys, [
+            ['polls-index', f'question-{self.question.id}']
+        ])
+
+    def test_admin_edit_purges_the_index(self):
+        index = reverse('polls:index')
+        local_proxy.get(self.client, index)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.question_text = "Edited question"
+            self.question.save()
+        response = local_proxy.get(self.client, index)
+        self.assertContains(response, "Edited question")
+
+
+class ReconcileVotesTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        self.choice1 = create_choice(self.question, "choice1")
+        self.choice2 = create_choice(self.question, "choice2")
+        # The first run records the baselines.
+        self._reconcile()
+
+    def _reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_votes', *args, stdout=out)
+        return out.getvalue()
+
+    def _votes(self):
+        return [
+            choice.votes
+            for choice in self.question.choice_set.order_by('pk')
+        ]
+
+    def test_no_drift(self):
+        apply_vote(self.question.id, self.choice1.id)
+        output = self._reconcile()
+        self.assertIn("Checked 1 question(s)", output)
+        self.assertIn("Repaired 0 drifted choice(s)", output)
+
+    def test_repairs_drift(self):
+        apply_vote(self.question.id, self.choice1.id)
+        apply_vote(self.question.id, self.choice2.id)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=5)
+        Choice.objects.filter(pk=self.choice2.pk).update(votes=0)
+        output = self._reconcile()
+        self.assertIn(
+            f"Choice {self.choice1.id}: 5 vote(s), 1 expected", output
+        )
+        self.assertIn("Repaired 2 drifted choice(s), net drift -3", output)
+        self.assertEqual(self._votes(), [1, 1])
+
+    def test_votes_before_the_vote_log_are_kept(self):
+        VoteOffset.objects.all().delete()
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=100)
+        Choice.objects.filter(pk=self.choice2.pk).update(votes=40)
+        apply_vote(self.question.id, self.choice1.id)
+        output = self._reconcile()
+        self.assertIn(
+            "Recorded the baselines of 1 question(s), "
+            "2 choice(s) have votes before the vote log.",
+            output
+        )
+        self.assertIn("Repaired 0", self._reconcile('--full'))
+        self.assertEqual(self._votes(), [101, 40])
+        Choice.objects.filter(pk=self.choice2.pk).update(votes=42)
+        self.assertIn("net drift -2", self._reconcile('--full'))
+        self.assertEqual(self._votes(), [101, 40])
+
+    def test_poll_type_changed_after_votes(self):
+        for _ in range(5):
+            apply_vote(self.question.id, self.choice1.id)
+        Question.objects.filter(pk=self.question.pk).update(
+            poll_type=Question.RANKED
+        )
+        self.question.refresh_from_db()
+        cast_ballot(self.question, [self.choice2.id])
+        self.assertIn("Repaired 0", self._reconcile('--full'))
+        self.assertEqual(self._votes(), [5, 1])
+
+    def test_dry_run(self):
+        apply_vote(self.question.id, self.choice1.id)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=3)
+        output = self._reconcile('--dry-run')
+        self.assertIn("Found 1 drifted choice(s)", output)
+        self.assertEqual(self._votes(), [3, 0])
+
+    def test_incremental_runs(self):
+        apply_vote(self.question.id, self.choice1.id)
+        self._reconcile()
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=3)
+        # No new votes since the last run, the question is skipped.
+        self.assertIn("Checked 0 question(s)", self._reconcile())
+        self.assertIn("Checked 1 question(s)", self._reconcile('--full'))
+        self.assertEqual(self._votes(), [1, 0])
+
+    @override_settings(POLLS_VOTE_QUEUE=True)
+    def test_pending_queued_votes_are_not_drift(self):
+        Vote.objects.create(
+            question_id=self.question.id,
+            choice_id=self.choice2.id
+        )
+        self.assertIn("Repaired 0", self._reconcile('--full'))
+        process_batch()
+        self.assertIn("Repaired 0", self._reconcile())
+        self.assertEqual(self._votes(), [0, 1])
+
+    def test_ballots(self):
+        self.question.poll_type = Question.RANKED
+        self.question.save()
+        Ballot.objects.create(
+            question=self.question,
+            choices=pack_ballot([self.choice2.id, self.choice1.id])
+        )
+        output = self._reconcile()
+        self.assertIn("Repaired 1 drifted choice(s), net drift +1", output)
+        self.assertEqual(self._votes(), [0, 1])
+
+
+class QuestionAdminTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        self.question = create_question(
+            question_text="The sample question",
+            days=-5
+        )
+        Choice.objects.bulk_create([
+            Choice(question=self.question, choice_text=f"choice{number}")
+            for number in range(60)
+        ])
+        self.url = reverse(
+            'admin:polls_question_change', args=(self.question.id,)
+        )
+
+    def _post_data(self, choices, **data):
+        published_date = timezone.localtime(self.question.published_date)
+        data.update({
+            'question_text': self.question.question_text,
+            'poll_type': self.question.poll_type,
+            'published_date_0': published_date.strftime('%Y-%m-%d'),
+            'published_date_1': published_date.strftime('%H:%M:%S'),
+            'choice_set-TOTAL_FORMS': str(len(choices)),
+            'choice_set-INITIAL_FORMS': str(len(choices)),
+            'choice_set-MIN_NUM_FORMS': '0',
+            'choice_set-MAX_NUM_FORMS': '1000',
+        })
+        for number, choice in enumerate(choices):
+            data.update({
+                f'choice_set-{number}-id': str(choice.id),
+                f'choice_set-{number}-question': str(self.question.id),
+                f'choice_set-{number}-choice_text': choice.choice_text,
+                f'choice_set-{number}-votes': str(choice.votes),
+            })
+        return data
+
+    def test_change_page_is_paginated(self):
+        response = self.client.get(self.url)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.initial_forms), 50)
+        self.assertContains(response, "Choices 1-50 of 60")
+        response = self.client.get(self.url, {'choice_page': 2})
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.initial_forms), 10)
+
+    def test_poll_type_is_read_only_once_voted(self):
+        response = self.client.get(self.url)
+        self.assertIn('poll_type', response.context['adminform'].form.fields)
+        choice = self.question.choice_set.first()
+        apply_vote(self.question.id, choice.id)
+        response = self.client.get(self.url)
+        self.assertNotIn(
+            'poll_type', response.context['adminform'].form.fields
+        )
+        response = self.client.post(self.url, self._post_data(
+            [], poll_type=Question.RANKED
+        ))
+        self.assertEqual(response.status_code, 302)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.poll_type, Question.SINGLE)
+
+    def test_pager_keeps_the_query_string(self):
+        response = self.client.get(self.url, {
+            'choice_page': 2,
+            '_changelist_filters': 'archived=0',
+            '_popup': 1,
+        })
+        self.assertContains(
+            response,
+            'href="?choice_page=1&amp;'
+            '_changelist_filters=archived%3D0&amp;_popup=1"'
+        )
+
+    def test_edit_second_page(self):
+        choices = list(self.question.choice_set.order_by('pk')[50:])
+        choices[0].choice_text = "edited"
+        choices[0].votes = 100
+        response = self.client.post(
+            f'{self.url}?choice_page=2', self._post_data(choices)
+        )
+        self.assertEqual(response.status_code, 302)
+        choices[0].refresh_from_db()
+        self.assertEqual(choices[0].choice_text, "edited")
+        # The vote counters are read-only.
+        self.assertEqual(choices[0].votes, 0)
+        self.assertEqual(self.question.choice_set.count(), 60)
+
+    def test_bulk_choices(self):
+        upload = SimpleUploadedFile(
+            'choices.txt', "uploaded1\nuploaded2\n".encode('utf-8')
+        )
+        response = self.client.post(self.url, self._post_data(
+            [],
+            bulk_choices="pasted1\n\n  pasted2  \n",
+            bulk_choices_file=upload
+        ))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.question.choice_set.count(), 64)
+        self.assertQuerysetEqual(
+            self.question.choice_set.order_by('pk')[60:],
+            ["pasted1", "pasted2", "uploaded1", "uploaded2"],
+            transform=str
+        )
+
+    def test_bulk_choices_too_long(self):
+        response = self.client.post(self.url, self._post_data(
+            [], bulk_choices="x" * 257
+        ))
+        self.assertContains(response, "at most 256 characters")
+        self.assertEqual(self.question.choice_set.count(), 60)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core import signing
+
+VOTE_TOKEN_SALT = 'polls.vote'
+
+
+def _signer():
+    return signing.TimestampSigner(salt=VOTE_TOKEN_SALT)
+
+
+def make_vote_token(question_id: int, poll_type: str = 'single') -> str:
+    """Return a signed, timestamped token allowing a vote
+    on the question with the given `question_id`.
+    """
+    return _signer().sign(f'{question_id}:{poll_type}')
+
+
+def check_vote_token(token: str, question_id: int):
+    """Return the poll type of the question if `token` is a valid,
+    unexpired vote token for the question with the given `question_id`,
+    otherwise None.
+    """
+    try:
+        value = _signer().unsign(
+            token,
+            max_age=settings.POLLS_VOTE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    token_question_id, _, poll_type = value.partition(':')
+    if token_question_id != str(question_id):
+        return None
+    return poll_type
@@ -4,6 +4,12 @@ from . import views
 app_name = 'polls'
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
+    path(
+        'collection/<slug:slug>/',
+        views.IndexView.as_view(),
+        name='collection'
+    ),
     path('poll/<int:pk>/', views.DetailView.as_view(), name='detail'),
+    path('poll/<int:pk>/vote/', views.VoteView.as_view(), name='vote'),
     path('poll/<int:pk>/results/', views.ResultsView.as_view(), name='results'),
 ]
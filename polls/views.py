@@ -1,62 +1,173 @@
-from django.db.models import F, Count
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import generic
-from .models import Choice, Question
+from django.views.decorators.csrf import csrf_exempt
+from .http_cache import INDEX_KEY, SurrogateCacheMixin, question_key
+from .ingestion import VoteQueueFull, apply_vote, enqueue_vote
+from .models import Choice, Collection, Question
+from .tally import cast_ballot, question_runoff
+from .tokens import check_vote_token, make_vote_token
 
 
-class IndexView(generic.ListView):
+def is_staff(request) -> bool:
+    """Return True if the request comes from a staff user.
+    The public-only settings have no authentication, so the
+    request may not have a `user` at all.
+    """
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def published_questions():
+    """Return the published questions that have greater than or equal
+    2 choice, or that have been moved to the archive.
+    """
+    return Question.objects.annotate(
+        n_choice=Count("choice")
+    ).filter(
+        Q(n_choice__gte=2) | Q(archived=True),
+        published_date__lte=timezone.now()
+    )
+
+
+def ballot_choices(poll_type, data) -> list:
+    """Return the chosen choice ids of a multi-select or ranked ballot,
+    ranked ballots are ordered by preference.
+    Raise ValueError for an invalid ballot.
+    """
+    if poll_type == Question.RANKED:
+        ranks = sorted(
+            (int(rank), int(key[len('rank-'):]))
+            for key, rank in data.items()
+            if key.startswith('rank-') and rank
+        )
+        if len({rank for rank, _ in ranks}) != len(ranks):
+            raise ValueError("Two choices have the same rank.")
+        return [choice_id for _, choice_id in ranks]
+    return [int(choice_id) for choice_id in data.getlist('choice')]
+
+
+def enqueue(question_id, choice_id):
+    """Append the vote to the vote log, or ask the voter
+    to try again later if the workers are behind.
+    """
+    try:
+        enqueue_vote(question_id, choice_id)
+    except VoteQueueFull:
+        response = HttpResponse(
+            "Too many votes right now, please try again.",
+            status=503
+        )
+        response['Retry-After'] = '5'
+        return response
+    return redirect(reverse('polls:results', args=(question_id,)))
+
+
+class IndexView(SurrogateCacheMixin, generic.ListView):
     template_name = 'polls/index.html'
     context_object_name = 'latest_questions'
+    collection = None
+
+    def surrogate_keys(self):
+        # The pages show the vote counts of their questions, purged
+        # with the pages of the questions.
+        return [INDEX_KEY] + [
+            question_key(question.pk) for question in self.object_list
+        ]
 
     def get_queryset(self):
         """Return the last ten published questions
         not including those set to be published in the future and
-        not including those have lower than 2 question.
+        not including those have lower than 2 question, but including
+        the archived ones.
         """
-        recent_questions = Question.objects.filter(
+        # Archiving moves every choice of a question at once, so only
+        # one of the two joins has rows and the sums are not multiplied.
+        recent_questions = Question.objects.annotate(
+            n_choice=Count('choice'),
+            n_votes=(
+                Coalesce(Sum('choice__votes'), 0) +
+                Coalesce(Sum('archivedchoice__votes'), 0)
+            )
+        ).filter(
+            Q(n_choice__gte=2) | Q(archived=True),
             published_date__lte=timezone.now()
         ).order_by('-published_date')
-        have_choice_questions = filter(
-            lambda question: question.choice_set.count() >= 2,
-            recent_questions
-        )
-        return list(have_choice_questions)[:10]
+        if 'slug' in self.kwargs:
+            self.collection = get_object_or_404(
+                Collection, slug=self.kwargs['slug']
+            )
+            recent_questions = recent_questions.filter(
+                collection=self.collection
+            )
+        return recent_questions[:10]
 
 
-class DetailView(generic.DetailView):
+class DetailView(SurrogateCacheMixin, generic.DetailView):
     model = Question
     template_name = 'polls/detail.html'
 
+    def surrogate_keys(self):
+        return [question_key(self.kwargs['pk'])]
+
     def get_queryset(self):
         """
         Excludes any questions that aren't published yet.
         and have greaten than or equal 2 choice.
         """
-        if self.request.user.is_staff:
+        if is_staff(self.request):
             return Question.objects.all()
-        return Question.objects.annotate(
-            n_choice=Count("choice")
-        ).filter(
-            n_choice__gte=2,
-            published_date__lte=timezone.now()
-        )
+        return published_questions()
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object.archived:
+            # Archived polls have no live choices to vote on.
+            return redirect('polls:results', pk=self.object.pk)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if settings.POLLS_STATELESS_VOTING:
+            context['vote_token'] = make_vote_token(
+                self.object.pk, self.object.poll_type
+            )
+        return context
 
     def post(self, request, *args, **kwargs):
         question_id = kwargs.get('pk')
-        if not request.user.is_staff:
-            filtered_question = Question.objects.annotate(
-                n_choice=Count("choice")
-            ).filter(
-                n_choice__gte=2,
-                published_date__lte=timezone.now()
-            )
+        if not is_staff(request):
+            filtered_question = published_questions()
         else:
             filtered_question = Question
         if question_id is None:
             return redirect('polls:index')
         question = get_object_or_404(filtered_question, pk=question_id)
+        if question.is_closed():
+            context = {
+                'question': question,
+                'error_message': "This poll is closed.",
+            }
+            return render(request, 'polls/detail.html', context)
+        if question.poll_type != Question.SINGLE:
+            try:
+                cast_ballot(
+                    question, ballot_choices(question.poll_type, request.POST)
+                )
+            except ValueError:
+                context = {
+                    'question': question,
+                    'error_message': "You didn't select a choice.",
+                }
+                return render(request, 'polls/detail.html', context)
+            return redirect(reverse('polls:results', args=(question.id,)))
         try:
             selected_choice: Choice = question.choice_set.get(
                 pk=request.POST['choice']
@@ -69,26 +180,101 @@ class DetailView(generic.DetailView):
             }
             return render(request, 'polls/detail.html', context)
         else:
-            # Using F() to avoiding race conditions
-            selected_choice.votes = F('votes') + 1
-            selected_choice.save()
+            if settings.POLLS_VOTE_QUEUE:
+                return enqueue(question.id, selected_choice.id)
+            apply_vote(question.id, selected_choice.id)
             return redirect(reverse('polls:results', args=(question.id,)))
 
 
-class ResultsView(generic.DetailView):
+class ResultsView(SurrogateCacheMixin, generic.DetailView):
     model = Question
     template_name = 'polls/results.html'
 
+    def surrogate_keys(self):
+        return [question_key(self.kwargs['pk'])]
+
     def get_queryset(self):
         """
         Excludes any questions that aren't published yet.
         and have greaten than or equal 2 choice.
         """
-        if self.request.user.is_staff:
+        if is_staff(self.request):
             return Question.objects.all()
-        return Question.objects.annotate(
-            n_choice=Count("choice")
-        ).filter(
-            n_choice__gte=2,
-            published_date__lte=timezone.now()
+        return published_questions()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object.poll_type == Question.RANKED:
+            context['winner'], context['rounds'] = question_runoff(
+                self.object
+            )
+        return context
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class VoteView(generic.View):
+    """Anonymous voting without the session or the CSRF cookie.
+
+    The voting form carries a signed vote token for its question,
+    issued by `DetailView`, so a vote only costs the counter update and
+    its vote log record, or the append to the vote log when
+    `POLLS_VOTE_QUEUE` is enabled.
+    """
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        question_id = kwargs['pk']
+        poll_type = check_vote_token(
+            request.POST.get('vote_token', ''), question_id
         )
+        if poll_type is None:
+            return self._error(
+                question_id,
+                "Your voting form has expired, please try again."
+            )
+        if poll_type != Question.SINGLE:
+            return self._cast_ballot(question_id, poll_type)
+        try:
+            choice_id = int(request.POST['choice'])
+        except (KeyError, ValueError):
+            return self._error(
+                question_id, "You didn't select a choice.", poll_type
+            )
+        if settings.POLLS_VOTE_QUEUE:
+            return enqueue(question_id, choice_id)
+        if not apply_vote(question_id, choice_id):
+            return self._error(
+                question_id, "You didn't select a choice.", poll_type
+            )
+        return redirect(reverse('polls:results', args=(question_id,)))
+
+    def _cast_ballot(self, question_id, poll_type):
+        question = get_object_or_404(published_questions(), pk=question_id)
+        if question.is_closed() or question.poll_type != poll_type:
+            return self._error(
+                question_id, "Your voting form has expired, please try again."
+            )
+        try:
+            cast_ballot(
+                question,
+                ballot_choices(question.poll_type, self.request.POST)
+            )
+        except ValueError:
+            return self._error(question_id, "You didn't select a choice.")
+        return redirect(reverse('polls:results', args=(question_id,)))
+
+    def _error(self, question_id, error_message, poll_type=None):
+        """Redisplay the question voting form with a fresh vote token.
+        A form of a poll whose type has changed since has expired.
+        """
+        question = get_object_or_404(published_questions(), pk=question_id)
+        if question.is_closed():
+            error_message = "This poll is closed."
+        elif poll_type is not None and question.poll_type != poll_type:
+            error_message = "Your voting form has expired, please try again."
+        context = {
+            'question': question,
+            'error_message': error_message,
+            'vote_token': make_vote_token(question.pk, question.poll_type),
+        }
+        return render(self.request, 'polls/detail.html', context)